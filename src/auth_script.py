@@ -1,8 +1,35 @@
 import os
+import pathlib
+import queue
+import threading
+import orjson
 import requests
 import webbrowser
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 from dotenv import load_dotenv
 
+class _CallbackHandler(BaseHTTPRequestHandler):
+    """Capture the query of the Strava OAuth redirect"""
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        
+        # Ignore unrelated requests such as /favicon.ico
+        if "code" not in query and "error" not in query:
+            self.send_response(404)
+            self.end_headers()
+            return
+        
+        self.server.callback_queries.put(query)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.end_headers()
+        self.wfile.write(b"Strava authorization received. You can close this window.")
+
+    def log_message(self, format, *args):
+        # Keep the console output limited to our own messages
+        pass
+
 class StravaAuthenticator:
     def __init__(self):
         # Load environment variables
@@ -37,25 +64,55 @@ class StravaAuthenticator:
         })
         
         if response.status_code == 200:
-            return response.json()
+            return orjson.loads(response.content)
         else:
             raise Exception(f"Token exchange failed: {response.text}")
 
-    def authenticate(self):
+    def refresh_access_token(self, refresh_token):
+        """Exchange refresh token for a new access token"""
+        token_url = "https://www.strava.com/oauth/token"
+        response = requests.post(token_url, data={
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "refresh_token": refresh_token,
+            "grant_type": "refresh_token"
+        })
+        
+        if response.status_code == 200:
+            return orjson.loads(response.content)
+        else:
+            raise Exception(f"Token refresh failed: {response.text}")
+
+    def authenticate(self, timeout=120):
         """Full authentication flow"""
-        # Open authorization URL
-        auth_url = self.get_authorization_url()
-        webbrowser.open(auth_url)
+        # Listen on the redirect URI so the authorization code is captured automatically
+        redirect = urlparse(self.redirect_uri)
+        if redirect.scheme != "http":
+            raise ValueError(f"STRAVA_REDIRECT_URI must be an http:// URL for the local callback server, got {self.redirect_uri}")
+        httpd = HTTPServer((redirect.hostname, redirect.port or 80), _CallbackHandler)
+        httpd.callback_queries = queue.Queue()
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        
+        try:
+            # Open authorization URL
+            auth_url = self.get_authorization_url()
+            webbrowser.open(auth_url)
+            
+            print("\n🚀 Strava Authorization\n")
+            print("A browser window has opened for Strava authorization.")
+            print(f"Waiting up to {timeout} seconds for the redirect to {self.redirect_uri} ...")
+            query = httpd.callback_queries.get(timeout=timeout)
+        except queue.Empty:
+            raise Exception("Timed out waiting for Strava authorization")
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
         
-        # Prompt for authorization code
-        print("\n🚀 Strava Authorization\n")
-        print("1. A browser window has opened for Strava authorization.")
-        print("2. After authorizing, you'll be redirected to a URL.")
-        print("3. Copy the ENTIRE URL from your browser.")
-        auth_code = input("\nEnter the FULL redirect URL: ").split("code=")[1].split("&")[0]
+        if "code" not in query:
+            raise Exception(f"Authorization failed: {query['error'][0]}")
         
         # Exchange code for tokens
-        tokens = self.exchange_token(auth_code)
+        tokens = self.exchange_token(query["code"][0])
         
         return {
             "access_token": tokens['access_token'],
@@ -65,11 +122,9 @@ class StravaAuthenticator:
 
 def save_tokens(tokens):
     """Save tokens securely"""
-    with open("strava_tokens.json", "w") as f:
-        json.dump(tokens, f)
+    pathlib.Path("strava_tokens.json").write_bytes(orjson.dumps(tokens))
 
 if __name__ == "__main__":
-    import json
     authenticator = StravaAuthenticator()
     tokens = authenticator.authenticate()
     save_tokens(tokens)
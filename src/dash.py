@@ -3,131 +3,71 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import datetime
+import pathlib
 from strava_data import StravaDataFetcher
 
-def apply_styling():
-    """Apply custom styling to dashboard."""
-    st.markdown("""
-    <style>
-    /* Global Styling */
-    .stApp {
-        background-color: #f4f6f9;
-        font-family: 'Inter', 'Segoe UI', Roboto, sans-serif;
-    }
-
-    /* Metrics Card Design */
-    .stMetric {
-        background-color: white;
-        border-radius: 12px;
-        box-shadow: 0 6px 12px rgba(0,0,0,0.08);
-        padding: 20px;
-        transition: transform 0.3s ease;
-        border: 1px solid #e1e4e8;
-    }
-    .stMetric:hover {
-        transform: scale(1.03);
-    }
-    .stMetric-value {
-        font-size: 2.2rem;
-        color: #2c3e50;
-        font-weight: 700;
-    }
-    .stMetric-label {
-        color: #7f8c8d;
-        font-weight: 600;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-    }
+# Dashboard stylesheet, read once at import time
+_CSS = (pathlib.Path(__file__).parent / "assets" / "dashboard.css").read_text()
 
-    /* Header and Title Styling */
-    .stHeader {
-        color: #2c3e50;
-        border-bottom: 3px solid #3498db;
-        padding-bottom: 12px;
-        margin-top: 25px;
-    }
-    .stTitle {
-        color: #2c3e50;
-        font-weight: 800;
-        text-align: center;
-        margin-bottom: 30px;
-    }
+@st.cache_resource
+def get_fetcher():
+    """Create a single data fetcher whose HTTP session survives reruns."""
+    return StravaDataFetcher()
 
-    /* Sidebar */
-    .sidebar .sidebar-content {
-        background-color: white;
-        border-radius: 12px;
-        box-shadow: 0 6px 12px rgba(0,0,0,0.08);
-        padding: 15px;
-    }
-    .sidebar .stSelectbox, .sidebar .stMultiSelect {
-        background-color: #f8f9fa;
-        border-radius: 8px;
-    }
+@st.cache_data(ttl=300)
+def load_profile():
+    """Fetch the athlete profile, cached across reruns."""
+    return get_fetcher().get_athlete_profile()
 
-    /* Tab Styling */
-    .stTabs > div {
-        gap: 20px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        background-color: #f1f3f5;
-        border-radius: 8px;
-        padding: 10px 20px;
-        transition: all 0.3s ease;
-    }
-    .stTabs [data-baseweb="tab-selected"] {
-        background-color: #3498db;
-        color: white !important;
-    }
+@st.cache_data(ttl=300)
+def load_activities_df():
+    """Fetch and process activities, cached across reruns."""
+    fetcher = get_fetcher()
+    return fetcher.process_activities(fetcher.get_all_activities())
 
-    /* Profile Image */
-    .profile-image-container {
-        display: flex;
-        justify-content: center;
-        align-items: center;
-        transition: transform 0.3s ease;
-    }
-    .profile-image-container:hover {
-        transform: scale(1.05);
-    }
-    .profile-image-border {
-        border: 4px solid #3498db;
-        border-radius: 50%;
-        overflow: hidden;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-    }
-    </style>
-    """, unsafe_allow_html=True)
+def apply_styling():
+    """Apply custom styling to dashboard."""
+    st.markdown(f"<style>{_CSS}</style>", unsafe_allow_html=True)
 
 def create_summary_metrics(df):
     """Create summary metrics with visuals and insights."""
     col1, col2, col3 = st.columns(3)
     
+    # Split the last 7 days from the 7 days before them
+    now = pd.Timestamp.now(tz="UTC")
+    week_start = now - pd.Timedelta(days=7)
+    prev_week_start = now - pd.Timedelta(days=14)
+    this_week = df[df['start_date'] >= week_start]
+    prev_week = df[(df['start_date'] >= prev_week_start) & (df['start_date'] < week_start)]
+    
     # Total Activities
     with col1:
         total_activities = len(df)
-        last_week_activities = len(df.iloc[-7:])
         st.metric(
             "Total Activities", 
             total_activities, 
-            delta=f"{total_activities - last_week_activities} vs Last Week",
+            delta=f"{len(this_week) - len(prev_week)} vs Last Week",
             delta_color="normal"
         )
     
     # Total Distance
     with col2:
-        total_distance = df['distance_km'].sum()
-        last_week_distance = df.iloc[-7:]['distance_km'].sum()
+        # Sum float32 columns in float64 to avoid accumulating rounding error
+        total_distance = df['distance_km'].astype("float64").sum()
+        distance_change = (
+            this_week['distance_km'].astype("float64").sum()
+            - prev_week['distance_km'].astype("float64").sum()
+        )
         st.metric(
             "Total Distance", 
             f"{total_distance:.2f} km", 
-            delta=f"{total_distance - last_week_distance:.2f} km",
+            delta=f"{distance_change:.2f} km vs Last Week",
             delta_color="normal"
         )
     
     # Average Speed
     with col3:
-        avg_speed = df['average_speed_kmh'].mean()
+        avg_speed = df['average_speed_kmh'].astype("float64").mean()
         st.metric(
             "Avg Speed", 
             f"{avg_speed:.2f} km/h", 
@@ -139,16 +79,18 @@ def create_activity_filter_sidebar(df):
     st.sidebar.header("🔍 Activity Explorer")
     
     # Collapsible sections for better organization
+    activity_types = df['type'].unique().tolist()
     with st.sidebar.expander("Activity Types", expanded=True):
         selected_types = st.multiselect(
             "Select Activity Types", 
-            df['type'].unique(), 
-            default=df['type'].unique(),
+            activity_types, 
+            default=activity_types,
             label_visibility="collapsed"
         )
     
-    # Convert datetime column to local date for comparison
-    df['local_start_date'] = df['start_date'].dt.date
+    # Date bounds from the precomputed day column (df is left unmodified)
+    first_date = df['start_date_only'].min().date()
+    last_date = df['start_date_only'].max().date()
     
     with st.sidebar.expander("Date Range", expanded=True):
         # Date Range Filter with more intuitive selection
@@ -156,16 +98,16 @@ def create_activity_filter_sidebar(df):
         with col1:
             start_date = st.date_input(
                 "From", 
-                min_value=df['local_start_date'].min(), 
-                max_value=df['local_start_date'].max(), 
-                value=df['local_start_date'].min()
+                min_value=first_date, 
+                max_value=last_date, 
+                value=first_date
             )
         with col2:
             end_date = st.date_input(
                 "To", 
-                min_value=df['local_start_date'].min(), 
-                max_value=df['local_start_date'].max(), 
-                value=df['local_start_date'].max()
+                min_value=first_date, 
+                max_value=last_date, 
+                value=last_date
             )
     
     # Optional intensity filter
@@ -177,18 +119,73 @@ def create_activity_filter_sidebar(df):
             float(df['average_speed_kmh'].min())
         )
     
-    # Filter DataFrame
-    filtered_df = df[
-        (df['type'].isin(selected_types)) & 
-        (df['local_start_date'].between(start_date, end_date)) &
-        (df['average_speed_kmh'] >= min_speed)
-    ]
+    # Filter DataFrame with a single combined boolean mask
+    type_mask = df['type'].isin(selected_types).to_numpy()
+    date_mask = df['start_date_only'].between(pd.Timestamp(start_date), pd.Timestamp(end_date)).to_numpy()
+    speed_mask = df['average_speed_kmh'].to_numpy() >= min_speed
+    filtered_df = df.iloc[type_mask & date_mask & speed_mask]
     
-    # Drop the temporary column
-    filtered_df = filtered_df.drop(columns=['local_start_date'])
+    # Drop categories that were filtered out so counts and legends skip them
+    filtered_df = filtered_df.assign(type=filtered_df['type'].cat.remove_unused_categories())
     
     return filtered_df
 
+@st.cache_data(ttl=300, max_entries=32)
+def build_type_pie(df):
+    """Build the activity type distribution pie chart."""
+    type_dist = df['type'].value_counts()
+    fig_type = px.pie(
+        values=type_dist.values,
+        names=type_dist.index,
+        title="Breakdown of Your Activities",
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+    fig_type.update_layout(
+        title_x=0.5, 
+        height=450, 
+        margin=dict(t=50, b=0, l=0, r=0)
+    )
+    return fig_type
+
+@st.cache_data(ttl=300, max_entries=32)
+def build_perf_bars(df):
+    """Build the distance vs moving time grouped bar chart."""
+    fig_details = go.Figure(data=[
+        go.Bar(name='Distance (km)', x=df['name'], y=df['distance_km']),
+        go.Bar(name='Moving Time (min)', x=df['name'], y=df['moving_time_min'])
+    ])
+    fig_details.update_layout(
+        barmode='group', 
+        title="Distance vs Moving Time",
+        xaxis_title="Activity Name",
+        yaxis_title="Value",
+        yaxis_hoverformat=".2f"
+    )
+    return fig_details
+
+@st.cache_data(ttl=300, max_entries=32)
+def build_elev_scatter(df):
+    """Build the distance vs elevation scatter plot."""
+    return px.scatter(
+        df,
+        x='distance_km',
+        y='total_elevation_gain',
+        color='type',
+        size='average_speed_kmh',
+        hover_name='name',
+        hover_data={
+            'distance_km': ':.2f',
+            'total_elevation_gain': ':.2f',
+            'average_speed_kmh': ':.2f'
+        },
+        title='Distance vs Elevation by Activity Type',
+        labels={
+            'distance_km': 'Distance (km)',
+            'total_elevation_gain': 'Elevation Gain',
+            'average_speed_kmh': 'Average Speed'
+        }
+    )
+
 def main():
     # Page Configuration
     st.set_page_config(
@@ -208,11 +205,14 @@ def main():
     
     # Fetch and process data
     try:
-        # Data Fetching
-        fetcher = StravaDataFetcher()
+        # Manual refresh bypasses both the Streamlit and HTTP caches
+        if st.sidebar.button("🔄 Refresh Data"):
+            get_fetcher().clear_cache()
+            load_profile.clear()
+            load_activities_df.clear()
         
         # Fetch Athlete Profile
-        athlete_profile = fetcher.get_athlete_profile()
+        athlete_profile = load_profile()
         
         # Profile Display
         col1, col2 = st.columns([1, 3])
@@ -244,8 +244,7 @@ def main():
                 st.metric("Friends", athlete_profile.get('total_friends', 0))
         
         # Fetch and Process Activities
-        activities = fetcher.get_activities()
-        df = fetcher.process_activities(activities)
+        df = load_activities_df()
         df['athlete_name'] = athlete_profile['name']
 
         # Sidebar Filtering
@@ -267,18 +266,7 @@ def main():
             with col1:
                 st.subheader("Activity Type Distribution")
                 type_dist = filtered_df['type'].value_counts()
-                fig_type = px.pie(
-                    values=type_dist.values,
-                    names=type_dist.index,
-                    title="Breakdown of Your Activities",
-                    color_discrete_sequence=px.colors.qualitative.Pastel
-                )
-                fig_type.update_layout(
-                    title_x=0.5, 
-                    height=450, 
-                    margin=dict(t=50, b=0, l=0, r=0)
-                )
-                st.plotly_chart(fig_type, use_container_width=True)
+                st.plotly_chart(build_type_pie(filtered_df), use_container_width=True)
             
             with col2:
                 st.subheader("Quick Stats")
@@ -295,50 +283,39 @@ def main():
             
             with col1:
                 # Distance and Moving Time Grouped Bar Chart
-                fig_details = go.Figure(data=[
-                    go.Bar(name='Distance (km)', x=filtered_df['name'], y=filtered_df['distance_km']),
-                    go.Bar(name='Moving Time (min)', x=filtered_df['name'], y=filtered_df['moving_time_min'])
-                ])
-                fig_details.update_layout(
-                    barmode='group', 
-                    title="Distance vs Moving Time",
-                    xaxis_title="Activity Name",
-                    yaxis_title="Value"
-                )
-                st.plotly_chart(fig_details, use_container_width=True)
+                st.plotly_chart(build_perf_bars(filtered_df), use_container_width=True)
             
             with col2:
                 # Elevation and Speed Scatter Plot
-                fig_elevation = px.scatter(
-                    filtered_df,
-                    x='distance_km',
-                    y='total_elevation_gain',
-                    color='type',
-                    size='average_speed_kmh',
-                    hover_name='name',
-                    title='Distance vs Elevation by Activity Type',
-                    labels={
-                        'distance_km': 'Distance (km)',
-                        'total_elevation_gain': 'Elevation Gain',
-                        'average_speed_kmh': 'Average Speed'
-                    }
-                )
-                st.plotly_chart(fig_elevation, use_container_width=True)
+                st.plotly_chart(build_elev_scatter(filtered_df), use_container_width=True)
         
         with tab3:
             # Detailed Data Analysis
             st.subheader("Raw Activity Data")
+            # Hide the helper day column used for date filtering
             st.dataframe(
-                filtered_df, 
+                filtered_df.drop(columns=['start_date_only']), 
                 use_container_width=True,
                 column_config={
                     "name": st.column_config.TextColumn(width="medium"),
                     "distance_km": st.column_config.NumberColumn(
                         format="%.2f km"
                     ),
+                    "moving_time_min": st.column_config.NumberColumn(
+                        format="%.2f min"
+                    ),
+                    "total_elevation_gain": st.column_config.NumberColumn(
+                        format="%.2f m"
+                    ),
                     "average_speed_kmh": st.column_config.NumberColumn(
                         format="%.2f km/h"
                     ),
+                    "average_heartrate": st.column_config.NumberColumn(
+                        format="%.1f bpm"
+                    ),
+                    "max_heartrate": st.column_config.NumberColumn(
+                        format="%.1f bpm"
+                    ),
                     "calories": st.column_config.NumberColumn(
                         format="%d cal"
                     )
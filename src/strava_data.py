@@ -1,24 +1,87 @@
 import os
-import json
+import time
+import pathlib
+import tempfile
+import threading
+import orjson
 import requests
+import requests_cache
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from limits import storage, strategies, RateLimitItemPerMinute, RateLimitItemPerDay
+
+class _RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter that throttles requests actually sent to Strava"""
+    # Client-side budget kept just under Strava's 100 per 15 minutes / 1000 per day quota
+    _rate_limits = (RateLimitItemPerMinute(90, 15), RateLimitItemPerDay(900))
+    _limiter = strategies.MovingWindowRateLimiter(storage.MemoryStorage())
+    _limiter_lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        # Cached responses never reach the adapter, so only real sends use budget
+        self._wait_for_rate_limit()
+        return super().send(request, **kwargs)
+
+    def _wait_for_rate_limit(self):
+        """Block until the request budget allows another API call"""
+        with self._limiter_lock:
+            while not all(self._limiter.test(limit, "strava") for limit in self._rate_limits):
+                time.sleep(0.1)
+            for limit in self._rate_limits:
+                self._limiter.hit(limit, "strava")
 
 class StravaDataFetcher:
     def __init__(self, tokens_file="strava_tokens.json"):
         # Load tokens
-        with open(tokens_file, 'r') as f:
-            self.tokens = json.load(f)
+        self.tokens_file = tokens_file
+        self._token_lock = threading.Lock()
+        self.tokens = orjson.loads(pathlib.Path(tokens_file).read_bytes())
+        
+        # Reuse one pooled connection across API calls and cache GET
+        # responses on disk to spare the API rate limit during reloads
+        self.session = requests_cache.CachedSession(
+            "strava_cache",
+            backend="sqlite",
+            expire_after=600,
+            allowable_methods=("GET",)
+        )
+        adapter = _RateLimitedAdapter(
+            pool_connections=4,
+            pool_maxsize=10,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504]
+            )
+        )
+        self.session.mount("https://", adapter)
+        self.session.headers["Authorization"] = f"Bearer {self.tokens['access_token']}"
         
         # Check token expiration
-        if datetime.now().timestamp() >= self.tokens['expires_at']:
-            self._refresh_token()
+        self._ensure_token()
+
+    def _ensure_token(self):
+        """Refresh access token if it expires within the next minute"""
+        if self.tokens['expires_at'] - datetime.now().timestamp() >= 60:
+            return
+        
+        # Re-check under the lock so concurrent callers refresh only once
+        with self._token_lock:
+            if self.tokens['expires_at'] - datetime.now().timestamp() < 60:
+                self._refresh_token()
 
     def _refresh_token(self):
-        """Refresh access token if expired"""
-        from .auth_script import StravaAuthenticator
+        """Refresh access token using the refresh token grant"""
+        try:
+            from .auth_script import StravaAuthenticator
+        except ImportError:
+            # Imported as a top-level module, e.g. by `streamlit run src/dash.py`
+            from auth_script import StravaAuthenticator
         authenticator = StravaAuthenticator()
-        new_tokens = authenticator.exchange_token(self.tokens['refresh_token'])
+        new_tokens = authenticator.refresh_access_token(self.tokens['refresh_token'])
         
         # Update tokens
         self.tokens = {
@@ -26,27 +89,34 @@ class StravaDataFetcher:
             "refresh_token": new_tokens['refresh_token'],
             "expires_at": new_tokens['expires_at']
         }
+        self.session.headers["Authorization"] = f"Bearer {self.tokens['access_token']}"
         
-        # Save updated tokens
-        with open("strava_tokens.json", "w") as f:
-            json.dump(self.tokens, f)
+        # Save updated tokens atomically so a crash can't corrupt the file
+        tokens_dir = os.path.dirname(os.path.abspath(self.tokens_file))
+        with tempfile.NamedTemporaryFile(dir=tokens_dir, suffix=".tmp", delete=False) as f:
+            f.write(orjson.dumps(self.tokens))
+        os.replace(f.name, self.tokens_file)
 
-    def get_activities(self, limit=30):
+    def clear_cache(self):
+        """Drop cached API responses so the next fetch hits Strava"""
+        self.session.cache.clear()
+
+    def get_activities(self, limit=30, page=1):
         """Fetch Strava activities"""
+        self._ensure_token()
         url = "https://www.strava.com/api/v3/athlete/activities"
-        headers = {"Authorization": f"Bearer {self.tokens['access_token']}"}
-        params = {"per_page": limit}
+        params = {"per_page": limit, "page": page}
         
         try:
-            response = requests.get(url, headers=headers, params=params)
+            response = self.session.get(url, params=params)
             
             if response.status_code != 200:
                 raise Exception(f"HTTP Error: {response.status_code} - {response.text}")
             
-            activities = response.json()
+            activities = orjson.loads(response.content)
             
             # Check if activities list is empty
-            if not activities:
+            if not activities and page == 1:
                 
                 print("Warning: No activities returned from Strava API")
             
@@ -59,35 +129,77 @@ class StravaDataFetcher:
             print(f"Unexpected error fetching activities: {e}")
             raise
 
+    def get_all_activities(self, max_pages=10, per_page=200, max_workers=5):
+        """Fetch activity history, requesting pages concurrently"""
+        # Refresh up front so worker threads normally find a valid token
+        self._ensure_token()
+        
+        # The first page tells us whether there is anything more to fetch
+        activities = self.get_activities(limit=per_page, page=1)
+        if len(activities) < per_page:
+            return activities
+        
+        # Fetch the remaining pages in batches, stopping at the first short page
+        next_page = 2
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while next_page <= max_pages:
+                pages = range(next_page, min(next_page + max_workers, max_pages + 1))
+                results = executor.map(lambda p: self.get_activities(limit=per_page, page=p), pages)
+                for batch in results:
+                    activities.extend(batch)
+                    if len(batch) < per_page:
+                        return activities
+                next_page += max_workers
+        
+        return activities
+
     def process_activities(self, activities):
         """Process raw Strava activities into a DataFrame"""
-        processed_data = []
-        for activity in activities:
-            processed_data.append({
-                "name": activity.get("name", "Unnamed Activity"),
-                "type": activity.get("type", "Unknown"),
-                "start_date": datetime.fromisoformat(activity.get("start_date", "").replace('Z', '+00:00')),
-                "distance_km": round(activity.get("distance", 0) / 1000, 2),
-                "moving_time_min": round(activity.get("moving_time", 0) / 60, 2),
-                "total_elevation_gain": round(activity.get("total_elevation_gain", 0), 2),
-                "average_speed_kmh": round(activity.get("average_speed", 0) * 3.6, 2),
-                "average_heartrate": activity.get("average_heartrate", None),
-                "max_heartrate": activity.get("max_heartrate", None)
-            })
-        return pd.DataFrame(processed_data)
+        df = pd.DataFrame(activities, columns=[
+            "name", "type", "start_date", "distance", "moving_time",
+            "total_elevation_gain", "average_speed", "average_heartrate", "max_heartrate"
+        ])
+        
+        # Fill missing values in bulk instead of per activity
+        df["name"] = df["name"].fillna("Unnamed Activity")
+        df["type"] = df["type"].fillna("Unknown")
+        numeric_cols = ["distance", "moving_time", "total_elevation_gain", "average_speed"]
+        df[numeric_cols] = df[numeric_cols].astype(float).fillna(0)
+        df[["average_heartrate", "max_heartrate"]] = df[["average_heartrate", "max_heartrate"]].astype(float)
+        
+        # Vectorized conversions
+        df["start_date"] = pd.to_datetime(df["start_date"], utc=True, format="ISO8601", cache=True)
+        df["start_date_only"] = df["start_date"].dt.tz_convert(None).dt.normalize()
+        df["distance_km"] = df["distance"].to_numpy() / 1000
+        df["moving_time_min"] = df["moving_time"].to_numpy() / 60
+        df["average_speed_kmh"] = df["average_speed"].to_numpy() * 3.6
+        
+        # Downcast to compact dtypes to shrink memory and serialized payloads.
+        # float32 can't hold 2-decimal values exactly, so rounding is left to display formatting
+        for col in ("distance_km", "moving_time_min", "total_elevation_gain", "average_speed_kmh"):
+            df[col] = pd.to_numeric(df[col], downcast="float")
+        for col in ("average_heartrate", "max_heartrate"):
+            df[col] = df[col].astype("Float32")
+        df["type"] = df["type"].astype("category")
+        
+        # Drop the raw API columns, keeping the processed ones in display order
+        return df.reindex(columns=[
+            "name", "type", "start_date", "start_date_only", "distance_km", "moving_time_min",
+            "total_elevation_gain", "average_speed_kmh", "average_heartrate", "max_heartrate"
+        ])
     
     def get_athlete_profile(self):
         """Fetch athlete profile information"""
+        self._ensure_token()
         url = "https://www.strava.com/api/v3/athlete"
-        headers = {"Authorization": f"Bearer {self.tokens['access_token']}"}
         
         try:
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url)
             
             if response.status_code != 200:
                 raise Exception(f"HTTP Error: {response.status_code} - {response.text}")
             
-            athlete_profile = response.json()
+            athlete_profile = orjson.loads(response.content)
             return {
                 "name": f"{athlete_profile.get('firstname', '')} {athlete_profile.get('lastname', '')}".strip(),
                 "username": athlete_profile.get('username'),